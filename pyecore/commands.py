@@ -2,12 +2,31 @@
 that can be executed onto a commands stack. Each command can also be 'undo' and
 'redo'.
 """
+import threading
+import weakref
 from abc import ABCMeta, abstractmethod
-from collections import UserList
+from collections import deque
+from contextlib import contextmanager
 from .ecore import EObject, BadValueError
 from .resources import ResourceSet
 
 
+# Holds the collections resolved during the execution of a batch
+_batch_context = threading.local()
+
+
+def _get_collection(owner, feature):
+    cache = getattr(_batch_context, 'collections', None)
+    if cache is None:
+        return owner.eGet(feature)
+    key = (id(owner), id(feature))
+    try:
+        return cache[key]
+    except KeyError:
+        collection = cache[key] = owner.eGet(feature)
+        return collection
+
+
 class Command(metaclass=ABCMeta):
     """Provides the basic elements that must be implemented by a custom
     command.
@@ -19,6 +38,8 @@ class Command(metaclass=ABCMeta):
     * undo (method)
     * redo (method)
     """
+    __slots__ = ()
+
     @property
     @abstractmethod
     def can_execute(self):
@@ -43,6 +64,11 @@ class Command(metaclass=ABCMeta):
 
 
 class AbstractCommand(Command):
+    __slots__ = ('owner', 'resource', 'feature', '_value', '_previous_value',
+                 'label', '_is_prepared', '_is_executable', '_executed',
+                 '_resolved_feature', '_undo_verified', '_feature_many',
+                 '_feature_name', '__weakref__')
+
     def __init__(self, owner=None, feature=None, value=None, label=None):
         if owner and not isinstance(owner, EObject):
             raise BadValueError(got=owner, expected=EObject)
@@ -54,19 +80,54 @@ class AbstractCommand(Command):
         self.label = label
         self._is_prepared = False
         self._is_executable = False
+        self._executed = False
+        self._resolved_feature = None
+        self._undo_verified = False
+        self._feature_many = False
+        self._feature_name = None
+        if feature is not None and not isinstance(feature, str):
+            self._feature_many = feature.many
+            self._feature_name = feature.name
+
+    # the undo values can be kept through weak references (see _store_ref),
+    # the accessors always give back the referenced objects
+    @property
+    def value(self):
+        value = self._value
+        return value() if isinstance(value, weakref.ref) else value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+
+    @property
+    def previous_value(self):
+        value = self._previous_value
+        return value() if isinstance(value, weakref.ref) else value
+
+    @previous_value.setter
+    def previous_value(self, value):
+        self._previous_value = value
 
     @property
     def can_execute(self):
-        execute = False
+        feature = self.feature
+        if feature is not None and feature is self._resolved_feature:
+            return True
         eclass = self.owner.eClass
-        if isinstance(self.feature, str):
-            actual = eclass.findEStructuralFeature(self.feature)
+        if isinstance(feature, str):
+            actual = eclass.findEStructuralFeature(feature)
             self.feature = actual
-            execute = actual is not None
         else:
-            actual = eclass.findEStructuralFeature(self.feature.name)
-            execute = self.feature is actual
-        return execute
+            actual = eclass.findEStructuralFeature(feature.name)
+            if feature is not actual:
+                return False
+        self._resolved_feature = actual
+        if actual is None:
+            return False
+        self._feature_many = actual.many
+        self._feature_name = actual.name
+        return True
 
     @property
     def can_undo(self):
@@ -76,39 +137,112 @@ class AbstractCommand(Command):
         self.do_execute()
         self._executed = True
 
+    @staticmethod
+    def _store_ref(obj):
+        """Returns a weak reference towards 'obj' if it is an object still
+        contained in a model, 'obj' otherwise.
+
+        Objects that are still part of a model are kept alive by the model,
+        there is no need for the command to keep them alive as well.
+        """
+        if isinstance(obj, EObject) and obj.eContainer() is not None:
+            return weakref.ref(obj)
+        return obj
+
+    @staticmethod
+    def _deref(ref):
+        if isinstance(ref, weakref.ref):
+            obj = ref()
+            if obj is None:
+                raise ReferenceError('Undo target was garbage collected')
+            return obj
+        return ref
+
     def __repr__(self):
-        if self.feature is None:
+        feature = self.feature
+        if feature is None:
             feature = 'NO_FEATURE'
-        elif not isinstance(self.feature, str):
-            feature = self.feature.name
-        else:
-            feature = self.feature
+        elif type(feature) is not str:
+            feature = self._feature_name
         return (f'{self.__class__.__name__} '
                 f'{self.owner}.{feature} <- { self.value}')
 
 
 class Set(AbstractCommand):
-    def __init__(self, owner=None, feature=None, value=None):
+    """Sets a value to a single feature of an object.
+
+    The previous value is required to undo the command. Two strategies can be
+    used to retrieve it:
+    * 'memento', the previous value is directly kept by the command,
+    * 'restore', the command only keeps a reference towards the previous
+      'Set' command executed on the same owner/feature in the command stack,
+      and restores its value. This avoids to keep alive large objects that
+      are not part of the model anymore. If no such command is known, the
+      'memento' strategy is used.
+
+    By default, 'restore' is used for references and 'memento' for
+    attributes.
+    """
+    __slots__ = ('strategy', 'previous_set', '_restore')
+    strategies = ('memento', 'restore')
+
+    def __init__(self, owner=None, feature=None, value=None, strategy=None):
         super().__init__(owner, feature, value)
+        if strategy is not None and strategy not in self.strategies:
+            raise ValueError(f'Unknown strategy "{strategy}", expected one '
+                             f'of {self.strategies}')
+        self.strategy = strategy
+        self.previous_set = None
+        self._restore = None
 
     @property
     def can_execute(self):
-        can = super().can_execute
-        return can and not self.feature.many
+        return super().can_execute and not self._feature_many
+
+    @property
+    def restore_key(self):
+        return (id(self.owner), self.feature.name)
 
     def undo(self):
-        self.owner.eSet(self.feature, self.previous_value)
+        restore = self._restore
+        if restore is not None:
+            self.owner.eSet(self.feature, restore.value)
+        else:
+            self.owner.eSet(self.feature, self._deref(self._previous_value))
 
     def redo(self):
         self.owner.eSet(self.feature, self.value)
 
     def do_execute(self):
         object_ = self.owner
-        self.previous_value = object_.eGet(self.feature)
-        object_.eSet(self.feature, self.value)
+        feature = self.feature
+        strategy = self.strategy
+        if strategy is None:
+            strategy = 'restore' if feature.is_reference else 'memento'
+        previous_value = object_.eGet(feature)
+        previous_set = self.previous_set
+        # only the command to restore is kept, not the whole 'Set' chain
+        self.previous_set = None
+        object_.eSet(feature, self.value)
+        if (strategy == 'restore' and previous_set is not None
+                and previous_set.value is previous_value):
+            self._restore = previous_set
+            self._previous_value = None
+        else:
+            self._restore = None
+            self._previous_value = self._store_ref(previous_value)
+
+    def _forget(self):
+        """Drops what is kept to undo the command, it cannot be undone
+        anymore.
+        """
+        self._restore = None
+        self._previous_value = None
 
 
 class Add(AbstractCommand):
+    __slots__ = ('index', '_collection')
+
     def __init__(self, owner=None, feature=None, value=None, index=None):
         super().__init__(owner, feature, value)
         self.index = index
@@ -116,15 +250,26 @@ class Add(AbstractCommand):
 
     @property
     def can_execute(self):
-        executable = super().can_execute
-        executable = executable and self.value is not None
-        self._collection = self.owner.eGet(self.feature)
-        return executable
+        if not super().can_execute or self.value is None:
+            return False
+        if self._collection is None:
+            self._collection = _get_collection(self.owner, self.feature)
+        # the upper bound is only known once the previous commands of a
+        # compound are executed, too large indexes are clamped on execution
+        index = self.index
+        return index is None or index >= 0
 
     @property
     def can_undo(self):
         can = super().can_undo
-        return can and self.value in self._collection
+        collection = self._collection
+        index = self.index
+        value = self.value
+        if not can:
+            return False
+        # the value can have been moved by a command executed afterwards
+        return ((0 <= index < len(collection) and collection[index] is value)
+                or value in collection)
 
     def undo(self):
         self._collection.pop(self.index)
@@ -133,14 +278,85 @@ class Add(AbstractCommand):
         self._collection.insert(self.index, self.value)
 
     def do_execute(self):
-        if self.index is not None:
-            self._collection.insert(self.index, self.value)
+        collection = self._collection
+        index = self.index
+        if index is not None:
+            if index > len(collection):
+                index = self.index = len(collection)
+            collection.insert(index, self.value)
+        else:
+            self.index = len(collection)
+            collection.append(self.value)
+
+
+class AddAll(AbstractCommand):
+    """Adds many values at once to a collection, optionally at a dedicated
+    index.
+
+    The values are added using a single bulk operation on the collection
+    instead of one 'Add' command per value. For unique collections, the
+    values which are already in the collection are ignored.
+    """
+    __slots__ = ('index', '_collection', '_start', '_added')
+
+    def __init__(self, owner=None, feature=None, values=None, index=None):
+        super().__init__(owner, feature,
+                         list(values) if values is not None else None)
+        self.index = index
+        self._collection = None
+        self._start = None
+        self._added = None
+
+    @property
+    def can_execute(self):
+        if not super().can_execute or self.value is None:
+            return False
+        if self._collection is None:
+            self._collection = _get_collection(self.owner, self.feature)
+        # the upper bound is only known once the previous commands of a
+        # compound are executed, too large indexes are clamped on execution
+        index = self.index
+        return index is None or index >= 0
+
+    def undo(self):
+        pop = self._collection.pop
+        start = self._start
+        for index in range(start + len(self._added) - 1, start - 1, -1):
+            pop(index)
+
+    def redo(self):
+        self._insert(self._added)
+
+    def _insert(self, values):
+        if not values:
+            # nothing to notify, the feature must not be marked as set
+            return
+        collection = self._collection
+        index = self._start
+        if index == len(collection):
+            collection.extend(values)
+        elif self.feature.unique:
+            insert = collection.insert
+            for i, value in enumerate(values, index):
+                insert(i, value)
         else:
-            self.index = len(self._collection)
-            self._collection.append(self.value)
+            collection[index:index] = values
+
+    def do_execute(self):
+        collection = self._collection
+        values = self.value
+        if self.feature.unique:
+            values = [x for x in dict.fromkeys(values) if x not in collection]
+        index = self.index
+        size = len(collection)
+        self._start = size if index is None or index > size else index
+        self._added = values
+        self._insert(values)
 
 
 class Remove(AbstractCommand):
+    __slots__ = ('index', '_collection')
+
     def __init__(self, owner=None, feature=None, value=None, index=None):
         super().__init__(owner, feature, value)
         self.index = index
@@ -151,32 +367,44 @@ class Remove(AbstractCommand):
 
     @property
     def can_execute(self):
-        executable = super().can_execute
-        self._collection = self.owner.eGet(self.feature)
-        if self.index is None:
-            executable = executable and self.value is not None
-        else:
-            self.value = self._collection[self.index]
-        return executable
+        if not super().can_execute:
+            return False
+        index = self.index
+        if index is None and self.value is None:
+            return False
+        if self._collection is None:
+            self._collection = _get_collection(self.owner, self.feature)
+        if index is None:
+            return True
+        if not 0 <= index < len(self._collection):
+            return False
+        self.value = self._collection[index]
+        return True
 
     def undo(self):
-        self._collection.insert(self.index, self.value)
+        value = self._value = self._deref(self._value)
+        self._collection.insert(self.index, value)
 
     def redo(self):
-        self._collection.pop(self.index)
+        self._value = self._store_ref(self._collection.pop(self.index))
 
     def do_execute(self):
-        if self.index is None:
-            self.index = self._collection.index(self.value)
-        self._collection.pop(self.index)
+        collection = self._collection
+        index = self.index
+        if index is None:
+            index = self.index = collection.index(self.value)
+        self._value = self._store_ref(collection.pop(index))
 
 
 class Move(AbstractCommand):
+    __slots__ = ('from_index', 'to_index', '_collection')
+
     def __init__(self, owner=None, feature=None, from_index=None,
                  to_index=None, value=None):
         super().__init__(owner, feature, value=value)
         self.from_index = from_index
         self.to_index = to_index
+        self._collection = None
         if bool(self.from_index is not None) == bool(self.value is not None):
             raise ValueError('Move command cannot have from_index and value '
                              'set together.')
@@ -184,12 +412,19 @@ class Move(AbstractCommand):
     @property
     def can_execute(self):
         can = super().can_execute
-        self._collection = self.owner.eGet(self.feature)
+        if self._collection is None:
+            self._collection = _get_collection(self.owner, self.feature)
+        collection = self._collection
         if self.value is None:
-            self.value = self._collection[self.from_index]
-        if self.from_index is None:
-            self.from_index = self._collection.index(self.value)
-        return can and self.value in self._collection
+            if not 0 <= self.from_index < len(collection):
+                return False
+            self.value = collection[self.from_index]
+        elif self.from_index is None:
+            try:
+                self.from_index = collection.index(self.value)
+            except (ValueError, KeyError):
+                return False
+        return can
 
     @property
     def can_undo(self):
@@ -198,18 +433,18 @@ class Move(AbstractCommand):
         return can and obj is self.value
 
     def undo(self):
-        self.value = self._collection.pop(self.to_index)
-        self._collection.insert(self.from_index, self.value)
+        self.value = self._collection.move(self.to_index, self.from_index)
 
     def redo(self):
         self.do_execute()
 
     def do_execute(self):
-        self.value = self._collection.pop(self.from_index)
-        self._collection.insert(self.to_index, self.value)
+        self.value = self._collection.move(self.from_index, self.to_index)
 
 
 class Delete(AbstractCommand):
+    __slots__ = ('references', 'inverse_references')
+
     def __init__(self, owner=None):
         super().__init__(owner=owner)
 
@@ -259,13 +494,100 @@ class Delete(AbstractCommand):
         return f'{self.__class__.__name__} {self.owner}'
 
 
-class Compound(Command, UserList):
+class Compound(Command, list):
+    __slots__ = ('_flat_cache', '_mutations', '_undo_verified',
+                 '__weakref__')
+
     def __init__(self, *commands):
-        super().__init__(commands)
+        self._flat_cache = None
+        self._mutations = 0
+        self._undo_verified = False
+        list.__init__(self, commands)
+
+    def _invalidate(self):
+        self._flat_cache = None
+        self._mutations += 1
+
+    def _leaves(self):
+        """Returns the leaf commands of this compound and of all its nested
+        compounds, in execution order.
+
+        The result is cached until this compound or one of its nested
+        compounds is modified.
+        """
+        cache = self._flat_cache
+        if cache is not None:
+            leaves, nested = cache
+            if all(c._mutations == mutations for c, mutations in nested):
+                return leaves
+        leaves = []
+        nested = []
+        stack = list(reversed(self))
+        while stack:
+            command = stack.pop()
+            if isinstance(command, Compound):
+                nested.append((command, command._mutations))
+                stack.extend(reversed(command))
+            else:
+                leaves.append(command)
+        leaves = tuple(leaves)
+        self._flat_cache = (leaves, tuple(nested))
+        return leaves
+
+    def __setitem__(self, i, item):
+        self._invalidate()
+        super().__setitem__(i, item)
+
+    def __delitem__(self, i):
+        self._invalidate()
+        super().__delitem__(i)
+
+    def __iadd__(self, other):
+        self._invalidate()
+        return super().__iadd__(other)
+
+    def __imul__(self, n):
+        self._invalidate()
+        return super().__imul__(n)
+
+    def append(self, item):
+        self._invalidate()
+        super().append(item)
+
+    def insert(self, i, item):
+        self._invalidate()
+        super().insert(i, item)
+
+    def pop(self, i=-1):
+        self._invalidate()
+        return super().pop(i)
+
+    def remove(self, item):
+        self._invalidate()
+        super().remove(item)
+
+    def clear(self):
+        self._invalidate()
+        super().clear()
+
+    def reverse(self):
+        self._invalidate()
+        super().reverse()
+
+    def sort(self, *args, **kwargs):
+        self._invalidate()
+        super().sort(*args, **kwargs)
+
+    def extend(self, other):
+        self._invalidate()
+        super().extend(other)
 
     @property
     def can_execute(self):
-        return all(command.can_execute for command in self)
+        for command in self._leaves():
+            if not command.can_execute:
+                return False
+        return True
 
     def execute(self):
         for command in self:
@@ -273,7 +595,10 @@ class Compound(Command, UserList):
 
     @property
     def can_undo(self):
-        return all(command.can_undo for command in self)
+        for command in self._leaves():
+            if not command.can_undo:
+                return False
+        return True
 
     def undo(self):
         for command in reversed(self):
@@ -287,13 +612,15 @@ class Compound(Command, UserList):
         return self[0] if len(self) == 1 else self
 
     def __repr__(self):
-        return f'{self.__class__.__name__}({self.data})'
+        return f'{self.__class__.__name__}({list.__repr__(self)})'
 
 
 class CommandStack(object):
-    def __init__(self):
-        self.stack = []
+    def __init__(self, history_limit=None):
+        self.stack = deque(maxlen=history_limit)
         self.stack_index = -1
+        self._last_set = {}
+        self._batch = None
 
     @property
     def top(self):
@@ -306,8 +633,18 @@ class CommandStack(object):
     @top.setter
     def top(self, command):
         index = self.stack_index + 1
-        self.stack[index:index] = [command]
-        self.stack_index = index
+        stack = self.stack
+        # executing a new command invalidates the redo tail
+        while len(stack) > index:
+            stack.pop()
+        if len(stack) == stack.maxlen:
+            # without any history, the new command itself is dropped
+            self._evict(stack[0] if stack else command)
+        stack.append(command)
+        # the command has just been executed, it can be undone right away
+        self._set_undo_verified(command, True)
+        # if the history limit is reached, the oldest command is dropped
+        self.stack_index = min(index, len(stack) - 1)
 
     @top.deleter
     def top(self):
@@ -316,10 +653,43 @@ class CommandStack(object):
     def __bool__(self):
         return self.stack_index > -1
 
+    @contextmanager
+    def batch(self):
+        """Gathers all the commands executed in the 'with' block and executes
+        them at the end of the block as a single 'Compound'.
+
+        The commands are not executed before the end of the block and they
+        are undone/redone as a single step. If an exception is raised in the
+        block, none of the commands are executed.
+        """
+        if self._batch is not None:
+            yield self
+            return
+        commands = self._batch = []
+        try:
+            yield self
+        finally:
+            self._batch = None
+        if commands:
+            _batch_context.collections = {}
+            try:
+                self.execute(Compound(*commands).unwrap())
+            finally:
+                _batch_context.collections = None
+
     def execute(self, *commands):
+        if self._batch is not None:
+            self._batch.extend(commands)
+            return
         for command in commands:
             if command.can_execute:
-                command.execute()
+                if isinstance(command, Set):
+                    key = command.restore_key
+                    command.previous_set = self._last_set.get(key)
+                    command.execute()
+                    self._last_set[key] = command
+                else:
+                    command.execute()
                 self.top = command
             else:
                 raise ValueError(f'Cannot execute command {command}')
@@ -327,13 +697,43 @@ class CommandStack(object):
     def undo(self):
         if not self:
             raise IndexError('Command stack is empty')
-        if self.top.can_undo:
-            self.top.undo()
+        top = self.top
+        if getattr(top, '_undo_verified', False) or top.can_undo:
+            self._set_undo_verified(top, False)
+            top.undo()
             del self.top
+            if isinstance(top, Set):
+                self._restore_last_set(top.restore_key, top._restore)
 
     def redo(self):
-        self.peek_next_top.redo()
+        command = self.peek_next_top
+        command.redo()
+        self._set_undo_verified(command, True)
         self.stack_index += 1
+        if isinstance(command, Set):
+            self._last_set[command.restore_key] = command
+
+    @staticmethod
+    def _set_undo_verified(command, verified):
+        # custom commands may have no room for the flag (e.g: __slots__), the
+        # undo checks are then always performed for them
+        if isinstance(command, (AbstractCommand, Compound)):
+            command._undo_verified = verified
+
+    def _evict(self, command):
+        # the oldest command leaves the history, nothing must keep it, its
+        # owner or its undo values alive anymore
+        if isinstance(command, Set):
+            key = command.restore_key
+            if self._last_set.get(key) is command:
+                del self._last_set[key]
+            command._forget()
+
+    def _restore_last_set(self, key, command):
+        if command is None:
+            self._last_set.pop(key, None)
+        else:
+            self._last_set[key] = command
 
 
 class EditingDomain(object):
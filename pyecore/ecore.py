@@ -21,10 +21,10 @@ import inspect
 from decimal import Decimal
 from datetime import datetime
 from itertools import chain
-from ordered_set import OrderedSet
 from weakref import WeakSet
 from RestrictedPython import compile_restricted, safe_builtins
 from .notification import ENotifer, Kind
+from .ordered_set_patch import OrderedSet
 from .innerutils import InternalSet, ignored, javaTransMap, parse_date
 
 
@@ -38,6 +38,18 @@ nsURI = 'http://www.eclipse.org/emf/2002/Ecore'
 eClassifiers = {}  # Will be automatically populated
 eSubpackages = []
 
+# Kinds of classifiers, used for a quick dispatch in EcoreUtils.isinstance
+NOT_A_CLASSIFIER = 0
+EENUM = 1
+EDATATYPE = 2
+ECLASS = 3
+
+# Features that decide which collection holds the values of a 'many'
+# feature, filled once the meta-meta level is defined
+_collection_kind_features = ()
+# Same for the defaultValueLiteral feature, mirrored by EStructuralFeature
+_default_literal_feature = None
+
 
 def default_eURIFragment():
     """
@@ -95,12 +107,14 @@ class Core(object):
             elif inspect.isfunction(feature):
                 if k.startswith('__'):
                     continue
-                argspect = inspect.getfullargspec(feature)
-                args = argspect.args
+                # positional parameters straight from the code object, the
+                # full signature introspection is too costly at import time
+                code = feature.__code__
+                args = code.co_varnames[:code.co_argcount]
                 if len(args) < 1 or args[0] != 'self':
                     continue
                 operation = EOperation(feature.__name__)
-                defaults = argspect.defaults
+                defaults = feature.__defaults__
                 len_defaults = len(defaults) if defaults else 0
                 nb_required = len(args) - len_defaults
                 for i, parameter_name in enumerate(args):
@@ -187,14 +201,16 @@ class MetaEClass(Metasubinstance):
 class EObject(ENotifer, metaclass=Metasubinstance):
     _staticEClass = True
     _instances = WeakSet()
+    # Class level defaults, most of the instances never change them, so they
+    # are only stored in the instance __dict__ once they are set.
+    _internal_id = None
+    _container = None
+    _containment_feature = None
+    _eresource = None
 
     def __new__(cls, *args, **kwargs):
         instance = super().__new__(cls)
-        instance._internal_id = None
         instance._isset = InternalSet()
-        instance._container = None
-        instance._containment_feature = None
-        instance._eresource = None
         instance.listeners = []
         instance._eternal_listener = []
         instance._inverse_rels = set()
@@ -203,9 +219,6 @@ class EObject(ENotifer, metaclass=Metasubinstance):
         cls._instances.add(instance)
         return instance
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-
     def force_resolve(self):
         return self
 
@@ -230,8 +243,12 @@ class EObject(ENotifer, metaclass=Metasubinstance):
 
     @property
     def eResource(self):
+        container = self._container
+        # roots are not contained, no need to raise an AttributeError
+        if container is None:
+            return self._eresource
         try:
-            return self._container.dyn_inst.eResource
+            return container.dyn_inst.eResource
         except AttributeError:
             return self._eresource
 
@@ -361,7 +378,9 @@ class EAnnotation(EModelElement):
 class ENamedElement(EModelElement):
     def __init__(self, name=None, **kwargs):
         super().__init__(**kwargs)
-        self.name = name
+        # names are a small vocabulary used as dict keys all over the place,
+        # str subclasses can't be interned and are kept as they are
+        self.name = sys.intern(name) if type(name) is str else name
 
 
 class SpecialEPackage(Metasubinstance):
@@ -372,13 +391,27 @@ class SpecialEPackage(Metasubinstance):
 
 
 class EPackage(ENamedElement, metaclass=SpecialEPackage):
+    _classifiers_cache = None
+
     def __init__(self, name=None, nsURI=None, nsPrefix=None, **kwargs):
         super().__init__(name, **kwargs)
         self.nsURI = nsURI
         self.nsPrefix = nsPrefix
+        self._eternal_listener.append(self)
+
+    def notifyChanged(self, notif):
+        if notif.feature is EPackage.eClassifiers:
+            self._classifiers_cache = None
 
     def getEClassifier(self, name):
-        return next((c for c in self.eClassifiers if c.name == name), None)
+        # classifiers by name, the first classifier wins
+        cache = self._classifiers_cache
+        if cache is None:
+            cache = {}
+            for classifier in self.eClassifiers:
+                cache.setdefault(classifier.name, classifier)
+            self._classifiers_cache = cache
+        return cache.get(name)
 
     # @staticmethod
     # def __isinstance__(self, instance=None):
@@ -400,7 +433,9 @@ class ETypedElement(ENamedElement):
         self.required = required
         if eGenericType:
             self.eGenericType = eGenericType
-        self._many_cache = self._compute_many()
+        # kept as a plain attribute (no property call on the hot paths), it
+        # is recomputed each time the upperBound changes
+        self.many = self._compute_many()
         self._eternal_listener.append(self)
 
     def _compute_many(self):
@@ -409,7 +444,7 @@ class ETypedElement(ENamedElement):
 
     def notifyChanged(self, notif):
         if notif.feature is ETypedElement.upperBound:
-            self._many_cache = self._compute_many()
+            self.many = self._compute_many()
 
     @property
     def upper(self):
@@ -419,10 +454,6 @@ class ETypedElement(ENamedElement):
     def lower(self):
         return self.lowerBound
 
-    @property
-    def many(self):
-        return self._many_cache
-
 
 class EOperation(ETypedElement):
     def __init__(self, name=None, eType=None, params=None, exceptions=None,
@@ -497,7 +528,9 @@ class EGenericType(EObject):
     def notifyChanged(self, notif):
         if (self.eContainmentFeature() is EClass.eGenericSuperTypes and
             notif.feature is EGenericType.eClassifier):
-            self.eContainer()._update_supertypes()
+            eclass = self.eContainer()
+            eclass._update_supertypes()
+            eclass._invalidate_caches()
 
 
 # class SpecialEClassifier(Metasubinstance):
@@ -511,6 +544,14 @@ class EGenericType(EObject):
 class EClassifier(ENamedElement):
     def __init__(self, name=None, **kwargs):
         super().__init__(name, **kwargs)
+        self._eternal_listener.append(self)
+
+    def notifyChanged(self, notif):
+        if notif.feature is ENamedElement.name:
+            # static classifiers are contained by modules, they don't cache
+            package = self._container
+            if getattr(package, '_classifiers_cache', None) is not None:
+                package._classifiers_cache = None
 
     @staticmethod
     def __isinstance__(self, instance=None):
@@ -522,6 +563,7 @@ class EClassifier(ENamedElement):
 
 class EDataType(EClassifier):
     transmap = javaTransMap
+    _ekind = EDATATYPE
 
     def __init__(self, name=None, eType=None, default_value=None,
                  from_string=None, to_string=None, instanceClassName=None,
@@ -578,9 +620,11 @@ class EDataType(EClassifier):
 
 
 class EEnum(EDataType):
+    _ekind = EENUM
+    _literals_cache = None
+
     def __init__(self, name=None, default_value=None, literals=None, **kwargs):
         super().__init__(name, eType=self, **kwargs)
-        self._eternal_listener.append(self)
         if literals:
             for i, lit_name in enumerate(literals):
                 lit_name = '_' + lit_name if lit_name[:1].isnumeric() \
@@ -591,7 +635,9 @@ class EEnum(EDataType):
             self.default_value = default_value
 
     def notifyChanged(self, notif):
+        super().notifyChanged(notif)
         if notif.feature is EEnum.eLiterals:
+            self._literals_cache = None
             if notif.kind is Kind.ADD:
                 literal = notif.new
                 self.__setattr__(literal.name, literal)
@@ -615,20 +661,36 @@ class EEnum(EDataType):
             raise AttributeError(f'Enumeration literal {value} does not exist '
                                  f'in {self}')
 
+    def _literals_maps(self):
+        # (literals by name, literals by value), the first literal wins
+        cache = self._literals_cache
+        if cache is None:
+            by_name = {}
+            by_value = {}
+            for literal in self.eLiterals:
+                by_name.setdefault(literal.name, literal)
+                by_value.setdefault(literal.value, literal)
+            cache = self._literals_cache = (by_name, by_value)
+        return cache
+
     def __contains__(self, key):
         if isinstance(key, EEnumLiteral):
             return key in self.eLiterals
-        return any(lit for lit in self.eLiterals if lit.name == key)
+        try:
+            return key in self._literals_maps()[0]
+        except TypeError:  # unhashable keys can't be literal names
+            return False
 
     def __instancecheck__(self, instance):
         return instance in self
 
     def getEEnumLiteral(self, name=None, value=0):
+        by_name, by_value = self._literals_maps()
         try:
             if name:
-                return next(lit for lit in self.eLiterals if lit.name == name)
-            return next(lit for lit in self.eLiterals if lit.value == value)
-        except StopIteration:
+                return by_name.get(name)
+            return by_value.get(value)
+        except TypeError:  # unhashable name or value
             return None
 
     def from_string(self, value):
@@ -643,6 +705,14 @@ class EEnumLiteral(ENamedElement):
     def __init__(self, name=None, value=0, **kwargs):
         super().__init__(name, **kwargs)
         self.value = value
+        self._eternal_listener.append(self)
+
+    def notifyChanged(self, notif):
+        if notif.feature is EEnumLiteral.name or \
+                notif.feature is EEnumLiteral.value:
+            eenum = self._container
+            if isinstance(eenum, EEnum):
+                eenum._literals_cache = None
 
     def __repr__(self):
         return f'{self.name}={self.value}'
@@ -652,6 +722,8 @@ class EEnumLiteral(ENamedElement):
 
 
 class EStructuralFeature(ETypedElement):
+    _default_literal = None
+
     def __init__(self, name=None, eType=None, changeable=True, volatile=False,
                  transient=False, unsettable=False, derived=False,
                  derived_class=None, **kwargs):
@@ -662,46 +734,48 @@ class EStructuralFeature(ETypedElement):
         self.unsettable = unsettable
         self.derived = derived
         self.derived_class = derived_class or ECollection
-        self._name = name
+        self._name = self.name
         self._eType = eType
+        self._collection_class = ECollection.collection_class(self)
 
     def notifyChanged(self, notif):
         super().notifyChanged(notif)
-        if notif.feature is ENamedElement.name:
-            self._name = notif.new
-        if notif.feature is ETypedElement.eType:
+        feature = notif.feature
+        if feature is ENamedElement.name:
+            name = notif.new
+            self._name = sys.intern(name) if type(name) is str else name
+            if isinstance(self._container, EClass):
+                self._container._invalidate_caches()
+        elif feature is ETypedElement.eType:
             self._eType = notif.new
+        elif feature in _collection_kind_features:
+            self._collection_class = ECollection.collection_class(self)
+        elif feature is _default_literal_feature:
+            self._default_literal = notif.new
 
     def __get__(self, instance, owner=None):
         if instance is None:
             return self
-        name = self._name
+        # The value container is created only once per instance, so the
+        # common case is a single dict probe (no 'in' test before it)
         instance_dict = instance.__dict__
-        if name in instance_dict:
-            value = instance_dict[name]
-            try:
+        try:
+            value = instance_dict[self._name]
+        except KeyError:
+            return self._create_value(instance_dict, instance)._get()
+        try:
+            if self.many:
                 return value._get()
-            except AttributeError:
-                return value
-        if self.many:
-            new_value = self.derived_class.create(instance, self)
-        else:
-            new_value = EValue(instance, self)
-        instance_dict[name] = new_value
-        return new_value._get()
+            return value._value  # EValue content, read without a call
+        except AttributeError:
+            return value
 
     def __set__(self, instance, value):
-        name = self._name
         instance_dict = instance.__dict__
-        if name not in instance_dict:
-            if self.many:
-                new_value = self.derived_class.create(instance, self)
-            else:
-                new_value = EValue(instance, self)
-            instance_dict[name] = new_value
-            previous_value = new_value
-        else:
-            previous_value = instance_dict[name]
+        try:
+            previous_value = instance_dict[self._name]
+        except KeyError:
+            previous_value = self._create_value(instance_dict, instance)
         if isinstance(previous_value, ECollection):
             if value is previous_value:
                 return
@@ -709,7 +783,15 @@ class EStructuralFeature(ETypedElement):
                 raise AttributeError('Cannot reafect an ECollection with '
                                      'another one, even if compatible')
             raise BadValueError(got=value, expected=previous_value.__class__)
-        instance_dict[name]._set(value)
+        previous_value._set(value)
+
+    def _create_value(self, instance_dict, instance):
+        if self.many:
+            new_value = self.derived_class.create(instance, self)
+        else:
+            new_value = EValue(instance, self)
+        instance_dict[self._name] = new_value
+        return new_value
 
     def __delete__(self, instance):
         name = self._name
@@ -743,7 +825,7 @@ class EAttribute(EStructuralFeature):
         if etype is None:
             self.eType = ENativeType
             return object()
-        default_literal = self.defaultValueLiteral
+        default_literal = self._default_literal
         if default_literal is not None:
             return etype.from_string(default_literal)
         if self.default_value is not None:
@@ -796,10 +878,15 @@ class EReference(EStructuralFeature):
 
 
 class EClass(EClassifier):
+    _ekind = ECLASS
+
     def __new__(cls, name=None, superclass=None, metainstance=None, **kwargs):
         if not isinstance(name, str):
             raise BadValueError(got=name, expected=str)
         instance = super().__new__(cls)
+        instance._feature_cache = None
+        instance._supertypes_cache = None
+        instance._partition_cache = None
         if isinstance(superclass, tuple):
             instance.eSuperTypes.extend(superclass)
         elif isinstance(superclass, EClass):
@@ -825,7 +912,7 @@ class EClass(EClassifier):
                 try:
                     super_types = tuple(sorted(super_types,
                                          key=lambda x: len(x.eClass
-                                                            .eAllSuperTypes())),
+                                                            ._all_supertypes())),
                                          reverse=True)
                     instance.python_class = type(name,
                                                  super_types,
@@ -844,7 +931,6 @@ class EClass(EClassifier):
                  metainstance=None, **kwargs):
         super().__init__(name, **kwargs)
         self.abstract = abstract
-        self._eternal_listener.append(self)
 
     def __call__(self, *args, **kwargs):
         if self.abstract:
@@ -861,10 +947,15 @@ class EClass(EClassifier):
             yield from (x for x in self._instances if isinstance(x, self))
 
     def notifyChanged(self, notif):
+        super().notifyChanged(notif)
+        if notif.feature in (EClass.eStructuralFeatures, EClass.eSuperTypes,
+                             EClass.eGenericSuperTypes):
+            self._invalidate_caches()
         # We do not update in case of static metamodel (could be changed)
         if getattr(self.python_class, '_staticEClass', False):
             return
-        if notif.feature is EClass.eSuperTypes:
+        # the python bases are also used to reach the subclasses caches
+        if notif.feature in (EClass.eSuperTypes, EClass.eGenericSuperTypes):
             self._update_supertypes()
         elif notif.kind in (Kind.REMOVE, Kind.REMOVE_MANY):
             if notif.kind is Kind.REMOVE:
@@ -894,6 +985,38 @@ class EClass(EClassifier):
         exec(code, safe_builtins, namespace)
         setattr(self.python_class, name, namespace[name])
 
+    def _invalidate_caches(self):
+        """Drops the features cached for this EClass and for all the EClasses
+        that inherit from it.
+        """
+        self._feature_cache = None
+        self._supertypes_cache = None
+        self._partition_cache = None
+        subclasses = self.python_class.__subclasses__()
+        while subclasses:
+            subclass = subclasses.pop()
+            eclass = subclass.__dict__.get('eClass')
+            if isinstance(eclass, EClass):
+                eclass._feature_cache = None
+                eclass._supertypes_cache = None
+            subclasses.extend(subclass.__subclasses__())
+
+    def _compute_feature_cache(self):
+        # (all features, features by name, all references, all attributes)
+        features = OrderedSet(self._eAllStructuralFeatures_gen())
+        by_name = {}
+        references = []
+        attributes = []
+        for feature in features:
+            by_name.setdefault(feature._name, feature)
+            if feature.is_reference:
+                references.append(feature)
+            elif feature.is_attribute:
+                attributes.append(feature)
+        self._feature_cache = (features, by_name, frozenset(references),
+                               frozenset(attributes))
+        return self._feature_cache
+
     def _update_supertypes(self):
         new_supers = self.__compute_supertypes()
         try:
@@ -902,7 +1025,7 @@ class EClass(EClassifier):
             try:
                 new_supers = tuple(sorted(new_supers,
                                     key=lambda x: len(x.eClass
-                                                       .eAllSuperTypes()),
+                                                       ._all_supertypes()),
                                     reverse=True))
                 self.python_class.__bases__ = new_supers
             except TypeError:
@@ -915,6 +1038,9 @@ class EClass(EClassifier):
         else:
             eSuperTypes = list(self.eSuperTypes)
             eSuperTypes.extend(x.eClassifier for x in self.eGenericSuperTypes if x.eClassifier is not None)
+            # generic supertypes can still be waiting for their classifier
+            if not eSuperTypes:
+                return (EObject,)
             if len(eSuperTypes) > 1 and EObject.eClass in eSuperTypes:
                 eSuperTypes.remove(EObject.eClass)
             return tuple(x.python_class for x in eSuperTypes)
@@ -922,28 +1048,46 @@ class EClass(EClassifier):
     def __repr__(self):
         return f'<{self.__class__.__name__} name="{self.name}">'
 
+    def _compute_partition_cache(self):
+        # (own attributes, own references)
+        attributes = []
+        references = []
+        for feature in self.eStructuralFeatures:
+            if feature.is_attribute:
+                attributes.append(feature)
+            elif feature.is_reference:
+                references.append(feature)
+        self._partition_cache = (tuple(attributes), tuple(references))
+        return self._partition_cache
+
     @property
     def eAttributes(self):
-        return [x for x in self.eStructuralFeatures
-                if x.is_attribute]
+        cache = self._partition_cache or self._compute_partition_cache()
+        return list(cache[0])
 
     @property
     def eReferences(self):
-        return [x for x in self.eStructuralFeatures
-                if x.is_reference]
+        cache = self._partition_cache or self._compute_partition_cache()
+        return list(cache[1])
 
     def findEStructuralFeature(self, name):
-        return next((f for f in self._eAllStructuralFeatures_gen()
-                     if f.name == name),
-                    None)
-
-    def _eAllSuperTypes_gen(self):
-        yield from (x.force_resolve() for x in self.eSuperTypes)
-        for x in self.eSuperTypes:
-            yield from x._eAllSuperTypes_gen()
+        cache = self._feature_cache or self._compute_feature_cache()
+        return cache[1].get(name)
+
+    def _all_supertypes(self):
+        # the supertypes of each direct supertype are memoized as well, so
+        # the hierarchy is only walked once
+        cache = self._supertypes_cache
+        if cache is None:
+            super_types = [x.force_resolve() for x in self.eSuperTypes]
+            cache = OrderedSet(chain(super_types,
+                                     *(x._all_supertypes()
+                                       for x in super_types)))
+            self._supertypes_cache = cache
+        return cache
 
     def eAllSuperTypes(self):
-        return OrderedSet(self._eAllSuperTypes_gen())
+        return self._all_supertypes().copy()
 
     def _eAllGenericSuperTypes_gen(self):
         super_types = self.eGenericSuperTypes
@@ -966,15 +1110,16 @@ class EClass(EClassifier):
             yield from parent.eClassifier._eAllStructuralFeatures_gen()
 
     def eAllStructuralFeatures(self):
-        return OrderedSet(self._eAllStructuralFeatures_gen())
+        cache = self._feature_cache or self._compute_feature_cache()
+        return cache[0].copy()
 
     def eAllReferences(self):
-        return set((x for x in self._eAllStructuralFeatures_gen()
-                    if x.is_reference))
+        cache = self._feature_cache or self._compute_feature_cache()
+        return set(cache[2])
 
     def eAllAttributes(self):
-        return set((x for x in self._eAllStructuralFeatures_gen()
-                    if x.is_attribute))
+        cache = self._feature_cache or self._compute_feature_cache()
+        return set(cache[3])
 
     def _eAllOperations_gen(self):
         yield from self.eOperations
@@ -1215,6 +1360,7 @@ EStructuralFeature.unsettable = EAttribute('unsettable', EBoolean)
 EStructuralFeature.derived = EAttribute('derived', EBoolean)
 EStructuralFeature.defaultValueLiteral = EAttribute('defaultValueLiteral',
                                                     EString)
+_default_literal_feature = EStructuralFeature.defaultValueLiteral
 
 EAttribute.iD = EAttribute('iD', EBoolean)
 
@@ -1260,6 +1406,9 @@ EStructuralFeature.eContainingClass = \
                    EReference('eContainingClass', EClass,
                               eOpposite=EClass.eStructuralFeatures)
 
+_collection_kind_features = (ETypedElement.ordered, ETypedElement.unique,
+                             EStructuralFeature.derived)
+
 EReference.containment = EAttribute('containment', EBoolean)
 EReference.eOpposite_ = EReference('eOpposite', EReference)
 EReference.resolveProxies = EAttribute('resolveProxies', EBoolean)
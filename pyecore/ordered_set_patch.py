@@ -1,100 +1,160 @@
+"""This module extends the OrderedSet implementation from the ordered_set
+package with the operations required by PyEcore (positional insert/pop/move,
+item assignment and deletion...).
+
+The original OrderedSet keeps in "map" the exact position of each item in
+"items", which forces a full sweep of "map" each time an element is
+inserted/removed elsewhere than at the tail. Instead, the positions stored in
+"map" are only trusted before "_stale_from", and they are lazily recomputed
+when a position is actually requested.
+"""
 import ordered_set
+from itertools import islice
 from typing import Iterable
 
 
 SLICE_ALL = ordered_set.SLICE_ALL
 
 
-# monkey patching the OrderedSet implementation
-def insert(self, index, key):
-    """Adds an element at a dedicated position in an OrderedSet.
-
-    This implementation is meant for the OrderedSet from the ordered_set
-    package only.
-    """
-    if key in self.map:
-        return
-    # compute the right index
-    size = len(self.items)
-    if index < 0:
-        index = size + index if size + index > 0 else 0
-    else:
-        index = index if index < size else size
-    # insert the value
-    self.items.insert(index, key)
-    for k, v in self.map.items():
-        if v >= index:
-            self.map[k] = v + 1
-    self.map[key] = index
-
-
-def pop(self, index=-1):
-    """Removes an element at the tail of the OrderedSet or at a dedicated
-    position.
-
-    This implementation is meant for the OrderedSet from the ordered_set
-    package only.
-    """
-    if not self.items:
-        raise KeyError('Set is empty')
-
-    elem = self.items[index]
-    del self.items[index]
-    del self.map[elem]
-    if elem != -1:
-        for k, v in self.map.items():
-            if v >= index and v > 0:
-                self.map[k] = v - 1
-    return elem
-
-
-def __setitem__(self, index, item):
-    if isinstance(index, slice):
-        raise KeyError('Item assignation using slices is not yet supported '
-                       f'for {self.__class__.__name__}')
-    if index < 0:
-        index = len(self.items) + index
+class OrderedSet(ordered_set.OrderedSet):
+    _stale_from = None
+
+    def _reindex(self):
+        """Recomputes the stale positions of the OrderedSet "map"."""
+        start = self._stale_from
+        if start is None:
+            return
+        self._stale_from = None
+        map_ = self.map
+        for i, key in enumerate(islice(self.items, start, None), start):
+            map_[key] = i
+
+    def _mark_stale(self, index):
+        stale = self._stale_from
+        if stale is None or index < stale:
+            self._stale_from = index
+
+    def _update_items(self, items):
+        super()._update_items(items)
+        self._stale_from = None
+
+    def insert(self, index, key):
+        """Adds an element at a dedicated position in an OrderedSet."""
+        if key in self.map:
+            return
+        # compute the right index
+        size = len(self.items)
         if index < 0:
-            raise IndexError('assignement index out of range')
-    self.pop(index)
-    self.insert(index, item)
-
-
-def __getitem__(self, index):
-    if isinstance(index, slice) and index == SLICE_ALL:
-        return self.copy()
-    elif isinstance(index, Iterable):
-        return self.subcopy(self.items[i] for i in index)
-    elif isinstance(index, slice) or hasattr(index, "__index__"):
-        result = self.items[index]
-        if isinstance(result, list):
-            return self.subcopy(result)
+            index = size + index if size + index > 0 else 0
         else:
-            return result
-    else:
-        raise TypeError("Don't know how to index an OrderedSet by %r" % index)
-
-
-def __delitem__(self, index):
-    if isinstance(index, slice) and index == SLICE_ALL:
-        self.clear()
-        return
-    elif isinstance(index, slice):
-        raise KeyError('Item deletion using slices is not yet supported '
-                       f'for {self.__class__.__name__}')
-    self.pop(index)
-
-
-def subcopy(self, subitems):
-    """
-    This method is here mainly for overriding
-    """
-    return self.__class__(subitems)
-
-
-ordered_set.OrderedSet.insert = insert
-ordered_set.OrderedSet.pop = pop
-ordered_set.OrderedSet.__setitem__ = __setitem__
-ordered_set.OrderedSet.__getitem__ = __getitem__
-ordered_set.OrderedSet.__delitem__ = __delitem__
-ordered_set.OrderedSet.subcopy = subcopy
+            index = index if index < size else size
+        # insert the value
+        self.items.insert(index, key)
+        self.map[key] = index
+        if index < size:
+            self._mark_stale(index + 1)
+
+    def pop(self, index=-1):
+        """Removes an element at the tail of the OrderedSet or at a dedicated
+        position.
+        """
+        items = self.items
+        if not items:
+            raise KeyError('Set is empty')
+
+        elem = items[index]
+        del items[index]
+        del self.map[elem]
+        if index < 0:
+            index += len(items) + 1
+        if index < len(items):
+            self._mark_stale(index)
+        return elem
+
+    def move(self, from_index, to_index):
+        """Moves an element from a position to another one in the
+        OrderedSet.
+        """
+        items = self.items
+        elem = items[from_index]
+        size = len(items)
+        from_index %= size
+        del items[from_index]
+        size -= 1
+        if to_index < 0:
+            to_index = size + to_index if size + to_index > 0 else 0
+        else:
+            to_index = to_index if to_index < size else size
+        items.insert(to_index, elem)
+        self._mark_stale(min(from_index, to_index))
+        return elem
+
+    def add(self, key):
+        map_ = self.map
+        if key not in map_:
+            map_[key] = len(self.items)
+            self.items.append(key)
+            return map_[key]
+        self._reindex()
+        return map_[key]
+
+    append = add
+
+    def index(self, key):
+        if isinstance(key, Iterable) and not ordered_set._is_atomic(key):
+            return [self.index(subkey) for subkey in key]
+        self._reindex()
+        return self.map[key]
+
+    get_loc = index
+    get_indexer = index
+
+    def discard(self, key):
+        if key in self.map:
+            self._reindex()
+            i = self.map[key]
+            del self.items[i]
+            del self.map[key]
+            if i < len(self.items):
+                self._mark_stale(i)
+
+    def __setitem__(self, index, item):
+        if isinstance(index, slice):
+            raise KeyError('Item assignation using slices is not yet '
+                           f'supported for {self.__class__.__name__}')
+        if index < 0:
+            index = len(self.items) + index
+            if index < 0:
+                raise IndexError('assignement index out of range')
+        self.pop(index)
+        self.insert(index, item)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) and index == SLICE_ALL:
+            return self.copy()
+        elif isinstance(index, Iterable):
+            return self.subcopy(self.items[i] for i in index)
+        elif isinstance(index, slice) or hasattr(index, "__index__"):
+            result = self.items[index]
+            if isinstance(result, list):
+                return self.subcopy(result)
+            else:
+                return result
+        else:
+            raise TypeError("Don't know how to index an OrderedSet by %r"
+                            % index)
+
+    def __delitem__(self, index):
+        if isinstance(index, slice) and index == SLICE_ALL:
+            self.clear()
+            return
+        elif isinstance(index, slice):
+            raise KeyError('Item deletion using slices is not yet supported '
+                           f'for {self.__class__.__name__}')
+        self.pop(index)
+
+    def subcopy(self, subitems):
+        """
+        This method is here mainly for overriding
+        """
+        return self.__class__(subitems)
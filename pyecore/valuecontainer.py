@@ -1,9 +1,18 @@
-from .ecore import EProxy, EObject, EDataType
+from .ecore import EProxy, EObject, EDataType, \
+                   NOT_A_CLASSIFIER, ECLASS, EDATATYPE, EENUM
 from .notification import Notification, Kind
-from .ordered_set_patch import ordered_set
+from .ordered_set_patch import OrderedSet
 from collections.abc import MutableSet, MutableSequence
 from typing import Iterable
 
+# Bound once at module level: looking up Kind members (and object's attribute
+# accessors) on their class is costly on the notification hot paths
+_ADD, _ADD_MANY, _MOVE = Kind.ADD, Kind.ADD_MANY, Kind.MOVE
+_REMOVE, _REMOVE_MANY = Kind.REMOVE, Kind.REMOVE_MANY
+_SET, _UNSET = Kind.SET, Kind.UNSET
+_obj_get = object.__getattribute__
+_obj_set = object.__setattr__
+
 
 class BadValueError(TypeError):
     def __init__(self, got=None, expected=None, feature=None):
@@ -27,10 +36,20 @@ class EcoreUtils(object):
             return True
         elif obj.__class__ is _type:
             return True
-        elif _type.__class__ is EDataType and obj.__class__ is _type.eType:
-            return True
         elif _isinstance(obj, EProxy) and not obj.resolved:
-            return not obj.resolved
+            return True
+        # the kind of classifier is read from the class of _type, so python
+        # classes (e.g: EClass itself) are not taken for classifiers
+        kind = getattr(_type.__class__, '_ekind', NOT_A_CLASSIFIER)
+        if kind == ECLASS:
+            if _isinstance(obj, _type.python_class):
+                return True
+        elif kind == EDATATYPE:
+            if _isinstance(obj, _type.eType):
+                return True
+        elif kind == EENUM:
+            if obj in _type:
+                return True
         elif _isinstance(obj, _type):
             return True
         try:
@@ -48,7 +67,22 @@ class EcoreUtils(object):
         return previous
 
 
+def _value_container(obj, name):
+    """Gives the container (EValue/ECollection) that holds the value of the
+    feature 'name' of 'obj', creating it if required.
+    """
+    try:
+        return obj.__dict__[name]
+    except KeyError:
+        obj.__getattribute__(name)  # Force load
+        return obj.__dict__[name]
+
+
 class PyEcoreValue(object):
+    # no instance layout here, so collections can also inherit from the
+    # builtin list/set types
+    __slots__ = ()
+
     def __init__(self, owner, efeature):
         super().__init__()
         self.owner = owner
@@ -67,6 +101,11 @@ class PyEcoreValue(object):
             except Exception:
                 raise AttributeError(f'Feature {feature} has no type'
                                      'nor generic')
+        # most attribute values are exactly of the python type of their
+        # EDataType, read it live as instanceClassName can change it
+        if not self.is_ref and value.__class__ is getattr(etype, 'eType',
+                                                          None):
+            return
         if not _isinstance(value, etype):
             raise BadValueError(value, etype, feature)
 
@@ -92,6 +131,10 @@ class PyEcoreValue(object):
 
 
 class EValue(PyEcoreValue):
+    # an EValue is created for each single-valued feature of each object
+    __slots__ = ('owner', 'feature', 'is_ref', 'is_cont', 'generic_type',
+                 '_value')
+
     def __init__(self, owner, efeature):
         super().__init__(owner, efeature)
         self._value = efeature.get_default_value()
@@ -111,7 +154,7 @@ class EValue(PyEcoreValue):
         notif = Notification(old=previous_value,
                              new=value,
                              feature=efeature,
-                             kind=Kind.UNSET if value is None else Kind.SET)
+                             kind=_UNSET if value is None else _SET)
         owner.notify(notif)
         owner._isset[efeature] = None
 
@@ -139,33 +182,39 @@ class EValue(PyEcoreValue):
             if previous_value is None:
                 return
             if eOpposite.many:
-                object.__getattribute__(previous_value, opposite_name) \
+                _obj_get(previous_value, opposite_name) \
                       .remove(owner, update_opposite=False)
             else:
-                object.__setattr__(previous_value, opposite_name, None)
+                _obj_set(previous_value, opposite_name, None)
         else:
-            previous_value = value.__getattribute__(opposite_name)
+            container = _value_container(value, opposite_name)
             if eOpposite.many:
-                previous_value.append(owner, update_opposite=False)
+                container.append(owner, update_opposite=False)
             else:
                 # We disable the eOpposite update
-                value.__dict__[opposite_name]. \
-                      _set(owner, update_opposite=False)
+                container._set(owner, update_opposite=False)
 
 
 class ECollection(PyEcoreValue):
     @staticmethod
     def create(owner, feature):
+        return feature._collection_class(owner, feature)
+
+    @staticmethod
+    def collection_class(feature):
+        """Gives the collection kind that must be used to hold the values of
+        a 'many' feature.
+        """
         if feature.derived:
-            return EDerivedCollection(owner, feature)
+            return EDerivedCollection
         elif feature.ordered and feature.unique:
-            return EOrderedSet(owner, feature)
+            return EOrderedSet
         elif feature.ordered and not feature.unique:
-            return EList(owner, feature)
+            return EList
         elif feature.unique:
-            return ESet(owner, feature)
+            return ESet
         else:
-            return EBag(owner, feature)  # see for better implem
+            return EBag  # see for better implem
 
     def __init__(self, owner, efeature):
         super().__init__(owner, efeature)
@@ -186,16 +235,14 @@ class ECollection(PyEcoreValue):
                 owner._inverse_rels.add(couple)
             return
 
-        opposite_name = eOpposite._name
+        container = _value_container(owner, eOpposite._name)
         if eOpposite.many and not remove:
-            owner.__getattribute__(opposite_name).append(new_value, False)
+            container.append(new_value, False)
         elif eOpposite.many and remove:
-            owner.__getattribute__(opposite_name).remove(new_value, False)
+            container.remove(new_value, False)
         else:
             new_value = None if remove else new_value
-            owner.__getattribute__(opposite_name)  # Force load
-            owner.__dict__[opposite_name] \
-                 ._set(new_value, update_opposite=False)
+            container._set(new_value, update_opposite=False)
 
     def remove(self, value, update_opposite=True):
         if self.is_ref:
@@ -205,18 +252,19 @@ class ECollection(PyEcoreValue):
         super().remove(value)
         self.owner.notify(Notification(old=value,
                                        feature=self.feature,
-                                       kind=Kind.REMOVE))
+                                       kind=_REMOVE))
 
     def insert(self, i, y):
         self.check(y)
+        owner = self.owner
         if self.is_ref:
-            self._update_container(y)
-            self._update_opposite(y, self.owner)
+            if self.is_cont:
+                self._update_container(y)
+            self._update_opposite(y, owner)
         super().insert(i, y)
-        self.owner.notify(Notification(new=y,
-                                       feature=self.feature,
-                                       kind=Kind.ADD))
-        self.owner._isset[self.feature] = None
+        feature = self.feature
+        owner.notify(Notification(new=y, feature=feature, kind=_ADD))
+        owner._isset[feature] = None
 
     def pop(self, index=-1):
         value = super().pop(index)
@@ -225,7 +273,19 @@ class ECollection(PyEcoreValue):
             self._update_opposite(value, self.owner, remove=True)
         self.owner.notify(Notification(old=value,
                                        feature=self.feature,
-                                       kind=Kind.REMOVE))
+                                       kind=_REMOVE))
+        return value
+
+    def move(self, from_index, to_index):
+        """Moves the element at 'from_index' to 'to_index'.
+
+        The element stays in the collection, so neither its container nor
+        its opposite are updated, and a single MOVE notification is sent.
+        """
+        value = self._move(from_index, to_index)
+        self.owner.notify(Notification(old=from_index, new=value,
+                                       feature=self.feature,
+                                       kind=_MOVE))
         return value
 
     def clear(self):
@@ -238,7 +298,7 @@ class ECollection(PyEcoreValue):
                 self._update_container(None, previous_value=value)
                 self._update_opposite(value, self.owner, remove=True)
         notif = Notification(old=list(self), new=[], feature=self.feature,
-                             kind=Kind.REMOVE_MANY)
+                             kind=_REMOVE_MANY)
         super().clear()
         self.owner.notify(notif)
 
@@ -262,38 +322,61 @@ class EList(ECollection, list):
 
     def append(self, value, update_opposite=True):
         self.check(value)
+        owner = self.owner
         if self.is_ref:
-            self._update_container(value)
+            if self.is_cont:
+                self._update_container(value)
             if update_opposite:
-                self._update_opposite(value, self.owner)
-        super().append(value)
-        self.owner.notify(Notification(new=value,
-                                       feature=self.feature,
-                                       kind=Kind.ADD))
-        self.owner._isset[self.feature] = None
+                self._update_opposite(value, owner)
+        list.append(self, value)
+        feature = self.feature
+        owner.notify(Notification(new=value, feature=feature, kind=_ADD))
+        owner._isset[feature] = None
 
     def extend(self, sublist):
+        # all the values are checked before any of them is added
+        sublist = list(sublist)
         check = self.check
+        for value in sublist:
+            check(value)
+        owner = self.owner
         if self.is_ref:
             _update_container = self._update_container
             _update_opposite = self._update_opposite
-            owner = self.owner
             for value in sublist:
-                check(value)
                 _update_container(value)
                 _update_opposite(value, owner)
-        else:
-            for value in sublist:
-                check(value)
 
         super().extend(sublist)
-        self.owner.notify(Notification(new=sublist,
-                                       feature=self.feature,
-                                       kind=Kind.ADD_MANY))
-        self.owner._isset[self.feature] = None
+        owner.notify(Notification(new=sublist,
+                                  feature=self.feature,
+                                  kind=_ADD_MANY))
+        owner._isset[self.feature] = None
 
     update = extend
 
+    def _move(self, from_index, to_index):
+        # Instead of a pop() followed by an insert(), which both shift the
+        # whole tail of the list, only the elements between the two
+        # positions are shifted.
+        value = list.__getitem__(self, from_index)
+        size = len(self)
+        from_index %= size
+        last = size - 1
+        if to_index < 0:
+            to_index = last + to_index if last + to_index > 0 else 0
+        elif to_index > last:
+            to_index = last
+        getitem, setitem = list.__getitem__, list.__setitem__
+        if from_index < to_index:
+            setitem(self, slice(from_index, to_index),
+                    getitem(self, slice(from_index + 1, to_index + 1)))
+        elif to_index < from_index:
+            setitem(self, slice(to_index + 1, from_index + 1),
+                    getitem(self, slice(to_index, from_index)))
+        setitem(self, to_index, value)
+        return value
+
     def __setitem__(self, i, y):
         is_collection = isinstance(y, Iterable)
         if isinstance(i, slice) and is_collection:
@@ -313,11 +396,11 @@ class EList(ECollection, list):
             if sliced_elements and len(sliced_elements) > 1:
                 self.owner.notify(Notification(old=sliced_elements,
                                                feature=self.feature,
-                                               kind=Kind.REMOVE_MANY))
+                                               kind=_REMOVE_MANY))
             elif sliced_elements:
                 self.owner.notify(Notification(old=sliced_elements[0],
                                                feature=self.feature,
-                                               kind=Kind.REMOVE))
+                                               kind=_REMOVE))
 
         else:
             self.check(y)
@@ -325,9 +408,9 @@ class EList(ECollection, list):
                 self._update_container(y)
                 self._update_opposite(y, self.owner)
         super().__setitem__(i, y)
-        kind = Kind.ADD
+        kind = _ADD
         if is_collection and len(y) > 1:
-            kind = Kind.ADD_MANY
+            kind = _ADD_MANY
         elif is_collection:
             y = y[0] if y else y
         self.owner.notify(Notification(new=y,
@@ -347,49 +430,57 @@ class EAbstractSet(ECollection):
 
     def add(self, value, update_opposite=True):
         self.check(value)
+        owner = self.owner
         if self.is_ref:
-            self._update_container(value)
+            if self.is_cont:
+                self._update_container(value)
             if update_opposite:
-                self._update_opposite(value, self.owner)
+                self._update_opposite(value, owner)
         super().add(value)
-        self.owner.notify(Notification(new=value,
-                                       feature=self.feature,
-                                       kind=Kind.ADD))
-        self.owner._isset[self.feature] = None
+        feature = self.feature
+        owner.notify(Notification(new=value, feature=feature, kind=_ADD))
+        owner._isset[feature] = None
 
     append = add
 
     def update(self, others):
+        # all the values are checked before any of them is added
+        others = list(others)
         check = self.check
+        for value in others:
+            check(value)
         add = super().add
+        owner = self.owner
         if self.is_ref:
+            _update_container = self._update_container
+            _update_opposite = self._update_opposite
             for value in others:
-                check(value)
                 add(value)
-                self._update_container(value)
-                self._update_opposite(value, self.owner)
+                _update_container(value)
+                _update_opposite(value, owner)
         else:
             for value in others:
-                check(value)
                 add(value)
-        self.owner._isset[self.feature] = None
-        self.owner.notify(Notification(new=others,
-                                       feature=self.feature,
-                                       kind=Kind.ADD_MANY))
+        owner._isset[self.feature] = None
+        owner.notify(Notification(new=others,
+                                  feature=self.feature,
+                                  kind=_ADD_MANY))
     extend = update
 
 
-class EOrderedSet(EAbstractSet, ordered_set.OrderedSet):
+class EOrderedSet(EAbstractSet, OrderedSet):
     def __init__(self, owner, efeature=None):
         super().__init__(owner, efeature)
-        ordered_set.OrderedSet.__init__(self)
+        OrderedSet.__init__(self)
+
+    _move = OrderedSet.move
 
     def copy(self):
-        return ordered_set.OrderedSet(self)
+        return OrderedSet(self)
 
     @staticmethod
     def subcopy(sublist):
-        return ordered_set.OrderedSet(sublist)
+        return OrderedSet(sublist)
 
 
 class ESet(EOrderedSet):
@@ -431,3 +522,7 @@ class EDerivedCollection(MutableSet, MutableSequence, ECollection):
     def insert(self, index, value):
         raise AttributeError('Operation not permited '
                              f'for "{self.feature.name}" feature')
+
+    def move(self, from_index, to_index):
+        raise AttributeError('Operation not permited '
+                             f'for "{self.feature.name}" feature')
@@ -35,6 +35,33 @@ def test_ecoreutil_isinstance_estringtostringmap():
     assert EcoreUtils.isinstance({3: '3'}, EStringToStringMapEntry)
 
 
+def test_ecoreutil_isinstance_wrong_types():
+    A = EClass('A')
+    MyEnum = EEnum('MyEnum', literals=['A', 'B'])
+    assert not EcoreUtils.isinstance('test', EInteger)
+    assert not EcoreUtils.isinstance(EClass('B')(), A)
+    assert not EcoreUtils.isinstance(EEnum('Other', literals=['C']).C, MyEnum)
+    assert EcoreUtils.isinstance(MyEnum.B, MyEnum)
+
+
+def test_ecoreutil_isinstance_python_class():
+    assert EcoreUtils.isinstance(EClass('A'), EClass)
+    assert EcoreUtils.isinstance(EInteger, EDataType)
+
+
+def test_eattribute_check_instanceclassname_update():
+    MyType = EDataType('MyType', instanceClassName='java.lang.String')
+    A = EClass('A')
+    A.eStructuralFeatures.append(EAttribute('value', MyType))
+    a = A()
+    a.value = 'test'
+
+    MyType.instanceClassName = 'java.lang.Integer'
+    a.value = 4
+    with pytest.raises(BadValueError):
+        a.value = 'test'
+
+
 def test_eenum_empty_instance():
     MyEnum = EEnum('MyEnum')
     assert not MyEnum.default_value
@@ -76,6 +103,42 @@ def test_eenum_geteenum():
     assert MyEnum.getEEnumLiteral('F') is None
 
 
+def test_eenum_unhashable_keys():
+    MyEnum = EEnum('MyEnum', literals=['A', 'B'])
+    assert [1] not in MyEnum
+    assert {} not in MyEnum
+    assert MyEnum.getEEnumLiteral(name=['A']) is None
+    assert MyEnum.getEEnumLiteral(value=[0]) is None
+
+    A = EClass('A')
+    A.eStructuralFeatures.append(EAttribute('kind', MyEnum))
+    a = A()
+    with pytest.raises(BadValueError):
+        a.kind = [1]
+    with pytest.raises(BadValueError):
+        a.kind = {}
+
+
+def test_eenum_geteenum_update():
+    MyEnum = EEnum('MyEnum', literals=['A', 'B'])
+    assert MyEnum.getEEnumLiteral(name='C') is None
+    assert 'C' not in MyEnum
+
+    literal = EEnumLiteral('C', value=2)
+    MyEnum.eLiterals.append(literal)
+    assert MyEnum.getEEnumLiteral(name='C') is literal
+    assert MyEnum.getEEnumLiteral(value=2) is literal
+    assert 'C' in MyEnum
+    MyEnum.eLiterals.remove(literal)
+    assert 'C' not in MyEnum
+
+    MyEnum.B.name = 'D'
+    MyEnum.B.value = 5
+    assert 'B' not in MyEnum and 'D' in MyEnum
+    assert MyEnum.getEEnumLiteral(value=1) is None
+    assert MyEnum.getEEnumLiteral(value=5).name == 'D'
+
+
 def test_eenum_geteenum_print():
     MyEnum = EEnum('MyEnum', literals=['A', 'B', 'C'])
     assert MyEnum.__repr__()
@@ -372,6 +435,17 @@ def test_eattribute_defaultvalueliteral_dynamic():
     assert a.age == 42
 
 
+def test_eattribute_defaultvalueliteral_update():
+    attribute = EAttribute('age', EInt)
+    assert attribute.get_default_value() == 0
+
+    attribute.defaultValueLiteral = '42'
+    assert attribute.get_default_value() == 42
+
+    del attribute.defaultValueLiteral
+    assert attribute.get_default_value() == 0
+
+
 def test_eattribute_nonunique_clear():
     A = EClass('A')
     A.eStructuralFeatures.append(EAttribute('nums', EInt, upper=-1, unique=False))
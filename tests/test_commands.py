@@ -1,4 +1,6 @@
 import pytest
+import gc
+import weakref
 from pyecore.ecore import *
 from pyecore.commands import *
 from pyecore.resources import URI, ResourceSet
@@ -109,6 +111,40 @@ def test_command_abs():
     a.redo()
 
 
+def test_stack_custom_slotted_command():
+    class Counter(Command):
+        __slots__ = ('count',)
+
+        def __init__(self):
+            self.count = 0
+
+        @property
+        def can_execute(self):
+            return True
+
+        @property
+        def can_undo(self):
+            return self.count > 0
+
+        def execute(self):
+            self.count += 1
+
+        def undo(self):
+            self.count -= 1
+
+        def redo(self):
+            self.count += 1
+
+    stack = CommandStack()
+    counter = Counter()
+    stack.execute(counter)
+    assert counter.count == 1
+    stack.undo()
+    assert counter.count == 0
+    stack.redo()
+    assert counter.count == 1
+
+
 def test_command_set_name(mm):
     a = mm.A()
 
@@ -498,3 +534,558 @@ def test_command_resource(mm):
     resource.append(a)
     cmd = Set(a, 'name', 'test_value')
     assert cmd.resource is resource
+
+
+def test_command_can_execute_resolved_feature(mm, monkeypatch):
+    a = mm.A()
+    lookups = []
+    find = mm.A.findEStructuralFeature
+
+    def counting_find(name):
+        lookups.append(name)
+        return find(name)
+
+    monkeypatch.setattr(mm.A, 'findEStructuralFeature', counting_find)
+    set = Set(owner=a, feature='name', value='testValue')
+    assert set.can_execute
+    assert set.feature is find('name')
+    assert set.can_execute
+    assert set.can_execute
+    assert lookups == ['name']
+
+    other = Set(owner=a, feature=mm.B.findEStructuralFeature('toa'))
+    assert not other.can_execute
+    assert not other.can_execute
+
+
+def test_stack_execute_clears_redo(mm):
+    stack = CommandStack()
+    a = mm.A()
+
+    stack.execute(Set(a, 'name', 'testValue'))
+    stack.execute(Set(a, 'name', 'testValue2'))
+    stack.undo()
+    stack.undo()
+    assert len(stack.stack) == 2
+
+    stack.execute(Set(a, 'name', 'other'))
+    assert len(stack.stack) == 1
+    assert a.name == 'other'
+    with pytest.raises(IndexError):
+        stack.redo()
+    stack.undo()
+    assert a.name is None
+
+
+def test_stack_history_limit(mm):
+    stack = CommandStack(history_limit=2)
+    a = mm.A()
+
+    stack.execute(Set(a, 'name', 'testValue'))
+    stack.execute(Set(a, 'name', 'testValue2'))
+    stack.execute(Set(a, 'name', 'testValue3'))
+    assert len(stack.stack) == 2
+    assert stack.stack_index == 1
+
+    stack.undo()
+    assert a.name == 'testValue2'
+    stack.undo()
+    assert a.name == 'testValue'
+    with pytest.raises(IndexError):
+        stack.undo()
+
+    stack.redo()
+    stack.redo()
+    assert a.name == 'testValue3'
+
+
+def test_stack_no_history(mm):
+    stack = CommandStack(history_limit=0)
+    a = mm.A()
+    set = Set(a, 'name', 'test')
+    stack.execute(set)
+    assert a.name == 'test'
+    assert not stack
+    with pytest.raises(IndexError):
+        stack.undo()
+
+    set = weakref.ref(set)
+    gc.collect()
+    assert set() is None
+
+
+def test_stack_history_limit_releases_commands(mm):
+    stack = CommandStack(history_limit=3)
+    a = mm.A()
+    sets = []
+    for i in range(50):
+        command = Set(a, 'name', f'value{i}')
+        stack.execute(command)
+        sets.append(weakref.ref(command))
+    del command
+    gc.collect()
+    assert sum(ref() is not None for ref in sets) <= 4
+
+    root = mm.Root()
+    bs = []
+    for i in range(50):
+        b = mm.B()
+        root.bs.append(b)
+        stack.execute(Set(a, 'simple_tob', b))
+        bs.append(weakref.ref(b))
+    del b
+    gc.collect()
+    assert sum(ref() is not None for ref in bs) <= 5
+
+    stack = CommandStack(history_limit=3)
+    owners = []
+    for i in range(20):
+        owner = mm.A()
+        stack.execute(Set(owner, 'name', 'test'))
+        owners.append(weakref.ref(owner))
+    del owner
+    gc.collect()
+    assert sum(ref() is not None for ref in owners) == 3
+
+    for ref in reversed(owners[-3:]):
+        assert ref().name == 'test'
+        stack.undo()
+        assert ref().name is None
+    with pytest.raises(IndexError):
+        stack.undo()
+
+
+def test_command_set_strategy(mm):
+    a = mm.A()
+    with pytest.raises(ValueError):
+        Set(a, 'name', 'test', strategy='unknown')
+
+    stack = CommandStack()
+    b1, b2, b3 = mm.B(), mm.B(), mm.B()
+    set1 = Set(a, 'simple_tob', b1)
+    set2 = Set(a, 'simple_tob', b2)
+    set3 = Set(a, 'simple_tob', b3, strategy='memento')
+    stack.execute(set1, set2, set3)
+    assert set1.previous_value is None
+    assert set2.previous_value is None  # restored from set1
+    assert set3.previous_value is b2
+
+    stack.undo()
+    assert a.simple_tob is b2
+    stack.undo()
+    assert a.simple_tob is b1
+    stack.redo()
+    assert a.simple_tob is b2
+    stack.undo()
+    stack.undo()
+    assert a.simple_tob is None
+
+
+def test_command_set_strategy_default(mm):
+    a = mm.A()
+    stack = CommandStack()
+    set1 = Set(a, 'name', 'test')
+    set2 = Set(a, 'name', 'test2')
+    stack.execute(set1, set2)
+    assert set2.previous_value == 'test'
+
+    b1, b2 = mm.B(), mm.B()
+    stack.execute(Set(a, 'simple_tob', b1))
+    a.simple_tob = b2  # modified outside of the stack
+    set3 = Set(a, 'simple_tob', None)
+    stack.execute(set3)
+    assert set3.previous_value is b2
+    stack.undo()
+    assert a.simple_tob is b2
+
+
+def test_command_compound_nested(mm):
+    a = mm.A()
+    set1 = Set(owner=a, feature='name', value='testValue')
+    set2 = Set(owner=a, feature='name', value='testValue2')
+    nested = Compound(set2)
+    compound = Compound(set1, nested)
+    assert compound.can_execute
+
+    set3 = Set(owner=a, feature='names', value='testValue3')
+    nested.append(set3)
+    assert not compound.can_execute
+
+    nested.remove(set3)
+    assert compound.can_execute
+    compound.execute()
+    assert a.name == 'testValue2'
+    assert compound.can_undo
+    compound.undo()
+    assert a.name is None
+
+
+def test_command_compound_leaves_update(mm):
+    A = EClass('A')
+    A.eStructuralFeatures.append(EAttribute('name', EString))
+    A.eStructuralFeatures.append(EAttribute('values', EInt, upper=-1,
+                                            unique=False))
+    a = A()
+    compound = Compound(Add(a, 'values', 1))
+    assert compound.can_execute
+
+    compound *= 2
+    assert compound.can_execute
+    compound.execute()
+    assert a.values == [1, 1]
+    assert compound.can_undo
+    compound.undo()
+    assert a.values == []
+
+    compound = Compound(Set(a, 'name', 'b'), Set(a, 'name', 'a'))
+    assert compound.can_execute
+    compound.sort(key=lambda command: command.value)
+    assert compound.can_execute
+    compound.execute()
+    assert a.name == 'b'
+    assert compound.can_undo
+    compound.undo()
+    assert a.name is None
+
+
+def test_stack_batch(mm):
+    stack = CommandStack()
+    a = mm.A()
+    b1 = mm.B()
+
+    with stack.batch():
+        stack.execute(Set(a, 'name', 'testValue'))
+        stack.execute(Add(a, 'many_tob', b1))
+        assert a.name is None
+        with stack.batch():
+            stack.execute(Set(a, 'name', 'testValue2'))
+    assert a.name == 'testValue2'
+    assert b1 in a.many_tob
+    assert len(stack.stack) == 1
+    assert isinstance(stack.top, Compound)
+
+    stack.undo()
+    assert a.name is None
+    assert b1 not in a.many_tob
+    stack.redo()
+    assert a.name == 'testValue2'
+
+    with stack.batch():
+        stack.execute(Set(a, 'name', 'single'))
+    assert isinstance(stack.top, Set)
+
+    with pytest.raises(ValueError):
+        with stack.batch():
+            stack.execute(Set(a, 'names', 'test'))
+    assert len(stack.stack) == 2
+
+    with pytest.raises(RuntimeError):
+        with stack.batch():
+            stack.execute(Set(a, 'name', 'never'))
+            raise RuntimeError()
+    assert a.name == 'single'
+
+
+def test_command_add_remove_index_out_of_range(mm):
+    a = mm.A()
+    b = mm.B()
+
+    assert not Add(owner=a, feature='many_tob', index=-1, value=b).can_execute
+    assert not Remove(owner=a, feature='many_tob', index=0).can_execute
+
+    a.many_tob.append(b)
+    add = Add(owner=a, feature='many_tob', index=1, value=mm.B())
+    assert add.can_execute
+    assert Remove(owner=a, feature='many_tob', index=0).can_execute
+    assert not Remove(owner=a, feature='many_tob', index=1).can_execute
+
+
+def test_command_add_sequential_indexes(mm):
+    a = mm.A()
+    b1, b2 = mm.B(), mm.B()
+    stack = CommandStack()
+    stack.execute(Compound(Add(a, 'many_tob', b1, index=0),
+                           Add(a, 'many_tob', b2, index=1)))
+    assert a.many_tob == [b1, b2]
+    stack.undo()
+    assert a.many_tob == []
+
+    b3, b4 = mm.B(), mm.B()
+    with stack.batch():
+        stack.execute(Add(a, 'many_tob', b3, index=0))
+        stack.execute(AddAll(a, 'many_tob', [b4], index=1))
+    assert a.many_tob == [b3, b4]
+    stack.undo()
+    assert a.many_tob == []
+
+    add = Add(a, 'many_tob', b1, index=5)
+    stack.execute(add)
+    assert a.many_tob == [b1]
+    stack.undo()
+    assert a.many_tob == []
+
+
+def test_command_move_not_in_collection(mm):
+    a = mm.A()
+    b = mm.B()
+    a.many_tob.append(mm.B())
+
+    assert not Move(owner=a, feature='many_tob', value=b, to_index=0) \
+        .can_execute
+    assert not Move(owner=a, feature='many_tob', from_index=1, to_index=0) \
+        .can_execute
+
+
+def test_command_add_can_undo_index(mm):
+    a = mm.A()
+    b = mm.B()
+    add = Add(owner=a, feature='many_tob', value=b)
+    assert add.can_execute
+    add.execute()
+    assert add.index == 0
+    assert add.can_undo
+
+    a.many_tob.insert(0, mm.B())
+    assert add.can_undo
+    a.many_tob.remove(b)
+    assert not add.can_undo
+
+
+def test_command_set_many_feature(mm):
+    a = mm.A()
+    set = Set(owner=a, feature='many_tob', value=mm.B())
+    assert not set.can_execute
+    assert 'many_tob' in repr(set)
+
+    set = Set(owner=a, feature=mm.A.findEStructuralFeature('many_tob'))
+    assert not set.can_execute
+    assert 'many_tob' in repr(set)
+
+
+def test_stack_undo_verified(mm):
+    class CheckedSet(Set):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.undo_checks = 0
+
+        @property
+        def can_undo(self):
+            self.undo_checks += 1
+            return super().can_undo
+
+    stack = CommandStack()
+    a = mm.A()
+    set = CheckedSet(a, 'name', 'testValue')
+
+    stack.execute(set)
+    stack.undo()
+    assert a.name is None
+    stack.redo()
+    assert a.name == 'testValue'
+    stack.undo()
+    assert a.name is None
+    assert set.undo_checks == 0
+
+
+def test_command_slots(mm):
+    a = mm.A()
+    commands = (Set(a, 'name', 'test'), Add(a, 'many_tob', mm.B()),
+                Remove(a, 'many_tob', index=0),
+                Move(a, 'many_tob', from_index=0, to_index=1),
+                Delete(a), Compound())
+    for command in commands:
+        assert not hasattr(command, '__dict__')
+    assert not commands[0].can_undo
+
+
+def test_stack_batch_collection_cache(mm):
+    stack = CommandStack()
+    a = mm.A()
+    calls = []
+    eGet = a.eGet
+
+    def counting_eGet(feature):
+        calls.append(feature)
+        return eGet(feature)
+    a.eGet = counting_eGet
+
+    bs = [mm.B() for _ in range(5)]
+    with stack.batch():
+        for b in bs:
+            stack.execute(Add(a, 'many_tob', b))
+    assert a.many_tob == bs
+    assert len(calls) == 1
+
+    stack.execute(Add(a, 'many_tob', mm.B()))
+    assert len(calls) == 2
+
+
+def test_command_addall(mm):
+    a = mm.A()
+    b0 = mm.B()
+    a.many_tob.append(b0)
+    bs = [mm.B() for _ in range(3)]
+
+    add = AddAll(owner=a, feature='many_tob', values=bs + [b0, bs[0]])
+    assert add.can_execute
+    add.execute()
+    assert a.many_tob == [b0] + bs
+    assert all(b.eContainer() is a for b in bs)
+    assert add.can_undo
+    add.undo()
+    assert a.many_tob == [b0]
+    assert all(b.eContainer() is None for b in bs)
+    add.redo()
+    assert a.many_tob == [b0] + bs
+
+    a = mm.A()
+    a.many_tob.append(b0)
+    add = AddAll(owner=a, feature='many_tob', values=bs, index=0)
+    assert add.can_execute
+    add.execute()
+    assert a.many_tob == bs + [b0]
+    assert a.many_tob.index(b0) == 3
+    add.undo()
+    assert a.many_tob == [b0]
+    assert not AddAll(owner=a, feature='many_tob', values=bs,
+                      index=-1).can_execute
+
+
+def test_command_addall_nothing_to_add(mm):
+    a = mm.A()
+    b = mm.B()
+    a.many_tob.append(b)
+    a2 = mm.A()
+    observers = [LastObserver(a), LastObserver(a2)]
+    stack = CommandStack()
+    stack.execute(AddAll(a, 'many_tob', [b]))
+    stack.execute(AddAll(a2, 'many_tob', []))
+    assert all(observer.last is None for observer in observers)
+    assert a.many_tob == [b]
+    assert not a2.eIsSet('many_tob')
+
+    stack.undo()
+    stack.undo()
+    stack.redo()
+    assert all(observer.last is None for observer in observers)
+    assert a.many_tob == [b]
+
+
+def test_command_addall_list():
+    A = EClass('A')
+    A.eStructuralFeatures.append(EAttribute('values', EInt, upper=-1,
+                                            unique=False))
+    a = A()
+    a.values.extend([1, 2])
+    stack = CommandStack()
+    stack.execute(AddAll(a, 'values', [3, 3, 1], index=1))
+    assert a.values == [1, 3, 3, 1, 2]
+    stack.undo()
+    assert a.values == [1, 2]
+    stack.redo()
+    assert a.values == [1, 3, 3, 1, 2]
+    stack.execute(AddAll(a, 'values', [4, 5]))
+    assert a.values == [1, 3, 3, 1, 2, 4, 5]
+    stack.undo()
+    stack.undo()
+    assert a.values == [1, 2]
+
+
+def test_command_add_remove_invalid_no_collection(mm, monkeypatch):
+    a = mm.A()
+    lookups = []
+    eGet = a.eGet
+
+    def counting_eGet(feature):
+        lookups.append(feature)
+        return eGet(feature)
+
+    monkeypatch.setattr(a, 'eGet', counting_eGet)
+    assert not Add(owner=a, feature='many_tob').can_execute
+    assert not Add(owner=a, feature='unknown', value=mm.B()).can_execute
+    assert not Remove(owner=a, feature='unknown', index=0).can_execute
+    assert lookups == []
+
+    assert Add(owner=a, feature='many_tob', value=mm.B()).can_execute
+    assert len(lookups) == 1
+
+
+def test_command_compound_undo_order(mm):
+    a = mm.A()
+    b1, b2 = mm.B(), mm.B()
+    a.many_tob.append(b1)
+    compound = Compound(Add(a, 'many_tob', b2),
+                        Move(a, 'many_tob', value=b1, to_index=1))
+    assert compound.can_execute
+    compound.execute()
+    assert a.many_tob == [b2, b1]
+    assert compound.can_undo
+    compound.undo()
+    assert a.many_tob == [b1]
+    compound.redo()
+    assert a.many_tob == [b2, b1]
+
+
+def test_command_weak_undo_values(mm):
+    root = mm.Root()
+    a1, a2 = mm.A(), mm.A()
+    root.a_s.extend([a1, a2])
+    b = mm.B()
+    b.toa = a1
+
+    set = Set(b, 'toa', a2, strategy='memento')
+    assert set.can_execute
+    set.execute()
+    assert set.previous_value is a1
+    set.undo()
+    assert b.toa is a1
+
+    set.redo()
+    root.a_s.remove(a1)
+    del a1
+    gc.collect()
+    with pytest.raises(ReferenceError):
+        set.undo()
+
+    b2 = mm.B()
+    a2.many_tob.append(b2)
+    remove = Remove(a2, 'many_tob', value=b2)
+    assert remove.can_execute
+    remove.execute()
+    assert remove.value is b2
+    remove.undo()
+    assert a2.many_tob == [b2]
+
+
+def test_command_weak_undo_values_accessors(mm):
+    C = EClass('C')
+    C.eStructuralFeatures.append(EReference('refs', mm.A, upper=-1))
+    root = mm.Root()
+    a = mm.A()
+    root.a_s.append(a)
+    c = C()
+    c.refs.append(a)
+
+    remove = Remove(c, 'refs', value=a)
+    assert remove.can_execute
+    remove.execute()
+    assert remove.value is a
+    assert 'weakref' not in repr(remove)
+    remove.undo()
+    assert c.refs == [a]
+
+    remove.redo()
+    root.a_s.remove(a)
+    del a
+    gc.collect()
+    assert remove.value is None
+    with pytest.raises(ReferenceError):
+        remove.undo()
+
+
+def test_command_weak_referenceable(mm):
+    a = mm.A()
+    set = Set(a, 'name', 'test')
+    assert weakref.ref(set)() is set
+    compound = Compound(set)
+    assert weakref.ref(compound)() is compound
@@ -1,3 +1,4 @@
+import sys
 import pytest
 from datetime import datetime
 from pyecore.ecore import *
@@ -527,6 +528,31 @@ def test_dynamic_crate_epackage():
     assert package.getEClassifier('A') is A
 
 
+def test_dynamic_epackage_geteclassifier_update():
+    A = EClass('A')
+    E = EEnum('E', literals=['x'])
+    package = EPackage('testpack', nsURI='http://test/1.0', nsPrefix='test')
+    package.eClassifiers.extend([A, E])
+    assert package.getEClassifier('A') is A
+    assert package.getEClassifier('B') is None
+    assert package.getEClassifier('E') is E
+
+    B = EClass('B')
+    package.eClassifiers.append(B)
+    assert package.getEClassifier('B') is B
+
+    package.eClassifiers.remove(A)
+    assert package.getEClassifier('A') is None
+
+    B.name = 'C'
+    assert package.getEClassifier('B') is None
+    assert package.getEClassifier('C') is B
+
+    E.name = 'F'
+    assert package.getEClassifier('E') is None
+    assert package.getEClassifier('F') is E
+
+
 def test_create_dynamic_ereference_ord_nonuni():
     A = EClass('A')
     B = EClass('B')
@@ -563,6 +589,21 @@ def test_create_dynamic_ereference_nonord_nonuni():
     assert a1.tob.__repr__()
 
 
+def test_create_dynamic_ereference_collection_kind_update():
+    A = EClass('A')
+    B = EClass('B')
+    tob = EReference('tob', B, upper=-1)
+    A.eStructuralFeatures.append(tob)
+    assert isinstance(A().tob, EOrderedSet)
+
+    tob.unique = False
+    assert isinstance(A().tob, EList)
+    tob.ordered = False
+    assert isinstance(A().tob, EBag)
+    tob.derived = True
+    assert isinstance(A().tob, EDerivedCollection)
+
+
 def test_create_dynamic_ereference_elist_extend():
     A = EClass('A')
     B = EClass('B')
@@ -576,6 +617,38 @@ def test_create_dynamic_ereference_elist_extend():
     assert b2 in a1.tob
 
 
+def test_create_dynamic_elist_extend_generator():
+    A = EClass('A')
+    A.eStructuralFeatures.append(EAttribute('values', EInt, upper=-1,
+                                            unique=False))
+    A.eStructuralFeatures.append(EAttribute('uvalues', EInt, upper=-1))
+    a = A()
+    a.values.extend(x for x in range(3))
+    a.uvalues.extend(x for x in range(3))
+    assert a.values == [0, 1, 2]
+    assert list(a.uvalues) == [0, 1, 2]
+
+
+def test_create_dynamic_ereference_extend_checks_first():
+    A = EClass('A')
+    B = EClass('B')
+    A.eStructuralFeatures.append(EReference('tob', B, upper=-1,
+                                            unique=False, containment=True))
+    A.eStructuralFeatures.append(EReference('utob', B, upper=-1,
+                                            containment=True))
+    a = A()
+    b1 = B()
+    with pytest.raises(BadValueError):
+        a.tob.extend([b1, A()])
+    assert b1.eContainer() is None
+    assert a.tob == []
+
+    with pytest.raises(BadValueError):
+        a.utob.extend([b1, A()])
+    assert b1.eContainer() is None
+    assert len(a.utob) == 0
+
+
 def test_create_dynamic_ereference_elist_setitem():
     A = EClass('A')
     B = EClass('B')
@@ -649,6 +722,22 @@ def test_get_ereferences():
     assert eref in A.eReferences
 
 
+def test_get_eattributes_ereferences_update():
+    A = EClass('A')
+    assert A.eAttributes == [] and A.eReferences == []
+    name = EAttribute('name', EString)
+    eref = EReference('child', A, containment=True)
+    A.eStructuralFeatures.extend([name, eref])
+    assert A.eAttributes == [name]
+    assert A.eReferences == [eref]
+
+    A.eAttributes.clear()
+    assert A.eAttributes == [name]
+    A.eStructuralFeatures.remove(name)
+    assert A.eAttributes == []
+    assert A.eReferences == [eref]
+
+
 def test_eclass_emodelemenent_supertype():
     A = EClass('A', superclass=(EModelElement.eClass,))
     assert EModelElement.eAnnotations in A.eAllStructuralFeatures()
@@ -668,6 +757,126 @@ def test_eclass_remove_estructuralfeature():
         A.python_class.name
 
 
+def test_eclass_find_estructuralfeature_cache():
+    A = EClass('A')
+    B = EClass('B', superclass=(A,))
+    C = EClass('C', superclass=(B,))
+    assert C.findEStructuralFeature('name') is None
+
+    name = EAttribute('name', EString)
+    A.eStructuralFeatures.append(name)
+    assert C.findEStructuralFeature('name') is name
+    assert name in C.eAllStructuralFeatures()
+
+    A.eStructuralFeatures.remove(name)
+    assert C.findEStructuralFeature('name') is None
+    assert name not in C.eAllStructuralFeatures()
+
+    A.eStructuralFeatures.append(name)
+    name.name = 'label'
+    assert C.findEStructuralFeature('name') is None
+    assert C.findEStructuralFeature('label') is name
+
+
+def test_eclass_find_estructuralfeature_cache_supertypes():
+    A = EClass('A')
+    A.eStructuralFeatures.append(EAttribute('name', EString))
+    B = EClass('B')
+    assert B.findEStructuralFeature('name') is None
+
+    B.eSuperTypes.append(A)
+    assert B.findEStructuralFeature('name') is A.eStructuralFeatures[0]
+    B.eSuperTypes.remove(A)
+    assert B.findEStructuralFeature('name') is None
+
+
+def test_eclass_eallreferences_eallattributes_cache():
+    A = EClass('A')
+    B = EClass('B', superclass=(A,))
+    name = EAttribute('name', EString)
+    B.eStructuralFeatures.append(name)
+    assert B.eAllReferences() == set()
+    assert B.eAllAttributes() == {name}
+
+    toa = EReference('toa', A)
+    A.eStructuralFeatures.append(toa)
+    assert B.eAllReferences() == {toa}
+    B.eAllReferences().clear()
+    assert B.eAllReferences() == {toa}
+    assert B.eAllAttributes() == {name}
+
+
+def test_eclass_find_estructuralfeature_cache_generic_supertypes():
+    A = EClass('A')
+    B = EClass('B')
+    B.eGenericSuperTypes.append(EGenericType(eClassifier=A))
+    assert B.findEStructuralFeature('f') is None
+    f = EAttribute('f', EString)
+    A.eStructuralFeatures.append(f)
+    assert B.findEStructuralFeature('f') is f
+    assert f in B.eAllStructuralFeatures()
+
+    b = B()
+    b.f = 'test'
+    assert isinstance(b, A.python_class)
+
+    B.eGenericSuperTypes.pop()
+    assert B.findEStructuralFeature('f') is None
+
+
+def test_eclass_eallsupertypes_cache():
+    A, B, C = EClass('A'), EClass('B'), EClass('C')
+    C.eSuperTypes.append(B)
+    assert list(C.eAllSuperTypes()) == [B]
+
+    B.eSuperTypes.append(A)
+    assert list(C.eAllSuperTypes()) == [B, A]
+    C.eAllSuperTypes().clear()
+    assert list(C.eAllSuperTypes()) == [B, A]
+
+    B.eSuperTypes.remove(A)
+    assert list(C.eAllSuperTypes()) == [B]
+
+
+def test_estructuralfeature_name_interned():
+    A = EClass('A')
+    prefix = 'na'
+    name = EAttribute(prefix + 'me', EString)
+    A.eStructuralFeatures.append(name)
+    assert name.name is sys.intern('name')
+    name.name = prefix + 'ming'
+    assert name._name is sys.intern('naming')
+    assert A.findEStructuralFeature('naming') is name
+
+
+def test_enamedelement_str_subclass_name():
+    class Name(str):
+        pass
+
+    A = EClass(Name('A'))
+    assert A.name == 'A'
+    name = EAttribute(Name('name'), EString)
+    A.eStructuralFeatures.append(name)
+    assert A.findEStructuralFeature('name') is name
+    name.name = Name('naming')
+    assert name.name == 'naming'
+    assert A.findEStructuralFeature('naming') is name
+
+
+def test_eobject_eisset_repeated_sets():
+    A = EClass('A')
+    name = EAttribute('name', EString)
+    value = EAttribute('value', EInt)
+    A.eStructuralFeatures.extend([name, value])
+    a = A()
+    assert not a.eIsSet('name')
+    for i in range(100):
+        a.value = i
+        a.name = str(i)
+    assert a.eIsSet('name') and a.eIsSet(value)
+    assert list(a._isset) == [value, name]
+
+
 def test_eclass_remove_eoperation():
     A = EClass('A')
     operation = EOperation('testOperation')
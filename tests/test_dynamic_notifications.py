@@ -127,3 +127,27 @@ def test_notification_add_many(lib):
     o.calls = 0
     root.ne_oset.extend([a1, a2])
     assert o.calls == 3 and o.kind is Kind.ADD_MANY and a1 in o.value and a2 in o.value
+
+
+def test_notification_move(lib):
+    root = lib.Root()
+    a1, a2, a3 = lib.A(), lib.A(), lib.A()
+    b1, b2, b3 = lib.B(), lib.B(), lib.B()
+    root.namedElements.extend([a1, a2, a3])
+    root.ne_oset.extend([b1, b2, b3])
+    observer = EObserver()
+    observer.observe(root)
+    notifications = []
+    observer.notifyChanged = notifications.append
+
+    assert root.namedElements.move(0, 2) is a1
+    assert root.namedElements == [a2, a3, a1]
+    assert root.namedElements.move(1, 0) is a3
+    assert root.namedElements == [a3, a2, a1]
+    assert root.ne_oset.move(-1, 0) is b3
+    assert root.ne_oset == [b3, b1, b2]
+    assert root.ne_oset.index(b2) == 2
+
+    assert [n.kind for n in notifications] == [Kind.MOVE] * 3
+    assert notifications[0].old == 0 and notifications[0].new is a1
+    assert a1.eContainer() is root
@@ -100,3 +100,42 @@ def test_orderedset_built_from_generator():
     o = OrderedSet(x for x in ['a', 'b', 'c', 3])
 
     assert o == ['a', 'b', 'c', 3]
+
+
+def test_orderedset_index_after_insert_pop():
+    o = OrderedSet([1, 2, 3])
+    o.insert(0, 0)
+    o.insert(2, 15)
+    assert o == [0, 1, 15, 2, 3]
+    assert [o.index(x) for x in o] == [0, 1, 2, 3, 4]
+
+    o.pop(1)
+    assert o.index(3) == 3
+    o.discard(15)
+    assert o == [0, 2, 3]
+    assert [o.index(x) for x in o] == [0, 1, 2]
+    assert o.add(2) == 1
+    assert o.add(4) == 3
+
+
+def test_orderedset_move():
+    o = OrderedSet([1, 2, 3, 4])
+    assert o.move(0, 2) == 1
+    assert o == [2, 3, 1, 4]
+    assert [o.index(x) for x in o] == [0, 1, 2, 3]
+
+    assert o.move(-1, -2) == 4
+    assert o == [2, 4, 3, 1]
+    assert o.move(0, 12) == 2
+    assert o == [4, 3, 1, 2]
+    assert [o.index(x) for x in o] == [0, 1, 2, 3]
+
+    with pytest.raises(IndexError):
+        o.move(4, 0)
+
+
+def test_orderedset_vanilla_untouched():
+    import ordered_set
+    assert OrderedSet is not ordered_set.OrderedSet
+    assert issubclass(OrderedSet, ordered_set.OrderedSet)
+    assert not hasattr(ordered_set.OrderedSet, 'insert')